@@ -1,26 +1,48 @@
 import csv
 import datetime as dt  # Python standard library datetime  module
+import io
 import logging
 import os
+import threading
 import unittest
 import zipfile
 import multiprocessing
+import matplotlib
+from matplotlib.backends.backend_agg import FigureCanvasAgg
 from matplotlib.colors import LinearSegmentedColormap
+from matplotlib.figure import Figure
 
 import numpy as np
 import pandas as pd
 import shapefile
 import shutil
+import tempfile
 import matplotlib.pyplot as plt
 import math
 
 from joblib import Parallel, delayed
+from mpl_toolkits.axes_grid1 import make_axes_locatable
 from mpl_toolkits.basemap import Basemap, cm
 from netCDF4 import Dataset
 
 from curwrf.wrf import utils
 from curwrf.wrf.resources import manager as res_mgr
 
+try:
+    from numba import njit
+    _HAS_NUMBA = True
+except ImportError:
+    _HAS_NUMBA = False
+
+try:
+    from PIL import Image
+except ImportError:
+    Image = None
+
+# color levels and map of the hourly satellite rain rate plots
+_CLEVS_HOURLY = np.concatenate(([-1, 0], np.array([pow(2, i) for i in range(0, 9)])))
+_CMAP_HOURLY = cm.s3pcpn_l
+
 
 def extract_time_data(nc_f):
     nc_fid = Dataset(nc_f, 'r')
@@ -265,15 +287,13 @@ def extract_kelani_upper_basin_mean_rainfall_sat(sat_dir, date, kelani_basin_shp
         sat_zip_file = '%s/%s/%s/%s/gsmap_nrt.%s%s%s.%s00.05_AsiaSS.csv.zip' % (sat_dir, y, m, d, y, m, d, sh)
 
         sat_zip = zipfile.ZipFile(sat_zip_file)
-        sat = np.genfromtxt(sat_zip.open('gsmap_nrt.%s%s%s.%s00.05_AsiaSS.csv' % (y, m, d, sh)), delimiter=',',
-                            names=True)
-        sat_filt = sat[(sat['Lat'] <= kel_lat_max) & (sat['Lat'] >= kel_lat_min) & (sat['Lon'] <= kel_lon_max) & (
-            sat['Lon'] >= kel_lon_min)]
+        sat = _read_jaxa_csv(sat_zip, 'gsmap_nrt.%s%s%s.%s00.05_AsiaSS.csv' % (y, m, d, sh))
+        sat_lat, sat_lon, sat_rf = _filter_jaxa_bbox(sat, kel_lat_min, kel_lat_max, kel_lon_min, kel_lon_max)
 
-        for p in sat_filt:
-            if utils.is_inside_polygon(polys, p[0], p[1]):
+        for lat, lon, rf in zip(sat_lat, sat_lon, sat_rf):
+            if utils.is_inside_polygon(polys, lat, lon):
                 cnt = cnt + 1
-                rf_sum = rf_sum + p[2]
+                rf_sum = rf_sum + rf
 
         output_file.write('%s-%s-%s_%s:00:00 %f\n' % (y, m, d, sh, rf_sum / cnt))
 
@@ -459,69 +479,249 @@ def extract_jaxa_satellite_data(start_ts_utc, end_ts_utc, output_dir):
 
     login = 'rainmap:Niskur+1404'
 
-    url0 = 'ftp://' + login + '@hokusai.eorc.jaxa.jp/realtime/txt/05_AsiaSS/YYYY/MM/DD/gsmap_nrt.YYYYMMDD.HH00.05_AsiaSS.csv.zip'
-    url1 = 'ftp://' + login + '@hokusai.eorc.jaxa.jp/now/txt/05_AsiaSS/gsmap_now.YYYYMMDD.HH00_HH59.05_AsiaSS.csv.zip'
+    url0 = 'ftp://' + login + '@hokusai.eorc.jaxa.jp/realtime/txt/05_AsiaSS/%(YYYY)s/%(MM)s/%(DD)s/' \
+                              'gsmap_nrt.%(YYYY)s%(MM)s%(DD)s.%(HH)s00.05_AsiaSS.csv.zip'
+    url1 = 'ftp://' + login + '@hokusai.eorc.jaxa.jp/now/txt/05_AsiaSS/' \
+                              'gsmap_now.%(YYYY)s%(MM)s%(DD)s.%(HH)s00_%(HH)s59.05_AsiaSS.csv.zip'
 
     def get_jaxa_url(ts):
         url_switch = (dt.datetime.utcnow() - ts) > dt.timedelta(hours=5)
         _url = url0 if url_switch else url1
-        ph = {'YYYY': ts.strftime('%Y'),
-              'MM': ts.strftime('%m'),
-              'DD': ts.strftime('%d'),
-              'HH': ts.strftime('%H')}
-        for k, v in ph.iteritems():
-            _url = _url.replace(k, v)
-        return _url
+        ph = dict(zip(('YYYY', 'MM', 'DD', 'HH'), ts.strftime('%Y %m %d %H').split()))
+        return _url % ph
 
     tmp_dir = os.path.join(output_dir, 'tmp_jaxa/')
     if not os.path.exists(tmp_dir):
         os.mkdir(tmp_dir)
 
     url_dest_list = []
-    for timestamp in np.arange(start, end, dt.timedelta(hours=1)).astype(dt.datetime):
+    hours = int((end - start).total_seconds() // 3600)
+    for h in range(hours):
+        timestamp = start + dt.timedelta(hours=h)
         url = get_jaxa_url(timestamp)
         url_dest_list.append((url, os.path.join(tmp_dir, os.path.basename(url)),
                               os.path.join(output_dir, 'jaxa_sat_rf_' + timestamp.strftime('%Y-%m-%d_%H:%M') + '.asc')))
 
     utils.download_parallel(url_dest_list)
 
+    # processes rather than threads: the contour plotting holds the GIL, and each worker builds its own high resolution
+    # basemap (several seconds, also under the GIL), so threads would run the bulk of the work one at a time
     procs = multiprocessing.cpu_count()
-    Parallel(n_jobs=procs)(
+    Parallel(n_jobs=procs, backend='multiprocessing')(
         delayed(process_zip_file)(i[1], i[2], lat_min, lon_min, lat_max, lon_max) for i in url_dest_list)
 
     # clean up temp dir
     shutil.rmtree(tmp_dir)
 
 
+def _grid_axis(sample, v_min, v_max, cell_size):
+    """
+    first cell centre of a regular grid at or above v_min and the number of cells up to v_max
+    :param sample: any cell centre value of the grid
+    :param v_min:
+    :param v_max:
+    :param cell_size:
+    :return: (origin, cell count)
+    """
+    # the sample is a float32, whose error grows with the number of cells to the area. Round it back to the value
+    # written in the csv before stepping across the grid
+    sample = round(sample, 4)
+    origin = round(sample + math.ceil((v_min - sample) / cell_size - 1e-6) * cell_size, 4)
+    return origin, int(math.floor((v_max - origin) / cell_size + 1e-6)) + 1
+
+
+if _HAS_NUMBA:
+    # the files are already spread over one worker per core, hence the kernels are serial rather than spawning numba
+    # threads of their own. nogil lets them run alongside other threads if called from a thread pool
+    @njit(nogil=True, cache=True, boundscheck=False)
+    def _scatter(lat, lon, rr, lat_min, lat_max, lon_min, lon_max, lat0, lon0, cell_size, out):
+        """
+        writes the rain rate of every point inside the bounding box into its cell of out
+        """
+        nrows, ncols = out.shape
+        for k in range(lat.size):
+            if lat_min <= lat[k] <= lat_max and lon_min <= lon[k] <= lon_max:
+                i = int(math.floor((lat[k] - lat0) / cell_size + 0.5))
+                j = int(math.floor((lon[k] - lon0) / cell_size + 0.5))
+                if 0 <= i < nrows and 0 <= j < ncols:
+                    out[i, j] = rr[k]
+
+    @njit(nogil=True, cache=True)
+    def _bbox_filter(lat, lon, rr, lat_min, lat_max, lon_min, lon_max, out_lat, out_lon, out_rr):
+        """
+        copies the points inside the bounding box to the front of the out arrays and returns their count
+        """
+        n = 0
+        for k in range(lat.size):
+            if lat_min <= lat[k] <= lat_max and lon_min <= lon[k] <= lon_max:
+                out_lat[n] = lat[k]
+                out_lon[n] = lon[k]
+                out_rr[n] = rr[k]
+                n += 1
+        return n
+
+
+def _warmup():
+    """
+    compiles the numba kernels on tiny inputs, so that the first file does not pay for it. With cache=True the
+    compiled code is kept in __pycache__ (or NUMBA_CACHE_DIR), hence a fresh worker process only loads it
+    """
+    pts = np.zeros(2, np.float32)
+    lo, hi = np.float32(0.0), np.float32(0.1)
+    _scatter(pts, pts, pts, lo, hi, lo, hi, 0.0, 0.0, 0.1, np.zeros((2, 2), np.float32))
+    _bbox_filter(pts, pts, pts, lo, hi, lo, hi, np.zeros(2, np.float32), np.zeros(2, np.float32),
+                 np.zeros(2, np.float32))
+
+
+if _HAS_NUMBA:
+    try:
+        _warmup()
+    except Exception as e:
+        logging.warning('Numba kernels could not be compiled, falling back to numpy: %s' % e)
+        _HAS_NUMBA = False
+
+
+def _filter_jaxa_bbox(sat, lat_min, lat_max, lon_min, lon_max):
+    """
+    returns the lat, lon and rain rate arrays of the satellite points inside the bounding box
+    :param sat: data frame returned by _read_jaxa_csv
+    :param lat_min:
+    :param lat_max:
+    :param lon_min:
+    :param lon_max:
+    :return:
+    """
+    lat = sat['Lat'].values
+    lon = sat['Lon'].values
+    rr = sat['RainRate'].values
+    # compare in float32 like the coordinates, otherwise a point lying on the edge of the box drops out
+    lat_min, lat_max, lon_min, lon_max = np.array([lat_min, lat_max, lon_min, lon_max], dtype=np.float32)
+    if _HAS_NUMBA:
+        out_lat = np.empty_like(lat)
+        out_lon = np.empty_like(lon)
+        out_rr = np.empty_like(rr)
+        n = _bbox_filter(lat, lon, rr, lat_min, lat_max, lon_min, lon_max, out_lat, out_lon, out_rr)
+        return out_lat[:n], out_lon[:n], out_rr[:n]
+
+    mask = (lat <= lat_max) & (lat >= lat_min) & (lon <= lon_max) & (lon >= lon_min)
+    return lat[mask], lon[mask], rr[mask]
+
+
+def _read_jaxa_csv(sat_zip, member):
+    # inflate the whole member in one call and parse it from memory, rather than streaming it through ZipExtFile
+    csv_buf = io.BytesIO(sat_zip.read(member))
+    return pd.read_csv(csv_buf, engine='c', header=0, usecols=['Lat', 'Lon', 'RainRate'], dtype=np.float32)
+
+
 def process_zip_file(zip_file_path, out_file_path, lat_min, lon_min, lat_max, lon_max):
-    sat_zip = zipfile.ZipFile(zip_file_path)
-    sat = np.genfromtxt(sat_zip.open(os.path.basename(zip_file_path).replace('.zip', '')), delimiter=',', names=True)
-    sat_filt = sat[
-        (sat['Lat'] <= lat_max) & (sat['Lat'] >= lat_min) & (sat['Lon'] <= lon_max) & (sat['Lon'] >= lon_min)]
-    lats = np.sort(np.unique(sat_filt['Lat']))
-    lons = np.sort(np.unique(sat_filt['Lon']))
+    # load the small archive in one read, so that zipfile seeks in memory. It holds a single csv
+    with open(zip_file_path, 'rb') as zip_file:
+        sat_zip = zipfile.ZipFile(io.BytesIO(zip_file.read()))
+    sat = _read_jaxa_csv(sat_zip, sat_zip.namelist()[0])
+    sat_lat = sat['Lat'].values
+    sat_lon = sat['Lon'].values
+    sat_rf = sat['RainRate'].values
 
     cell_size = 0.1
     no_data_val = -99
-    out_file = open(out_file_path, 'w')
-    out_file.write('NCOLS %d\n' % len(lons))
-    out_file.write('NROWS %d\n' % len(lats))
-    out_file.write('XLLCORNER %f\n' % lons[0])
-    out_file.write('YLLCORNER %f\n' % lats[0])
-    out_file.write('CELLSIZE %f\n' % cell_size)
-    out_file.write('NODATA_VALUE %d\n' % no_data_val)
-
-    for lat in np.flip(lats, 0):
-        for lon in lons:
-            out_file.write(str(sat[(sat['Lat'] == lat) & (sat['Lon'] == lon)][0][2]) + ' ')
-        out_file.write('\n')
 
-    out_file.close()
+    # JAXA grid is regular, hence the cell of each point can be computed directly
+    lat0, nrows = _grid_axis(float(sat_lat[0]), lat_min, lat_max, cell_size)
+    lon0, ncols = _grid_axis(float(sat_lon[0]), lon_min, lon_max, cell_size)
+
+    # compare in float32 like the coordinates, otherwise a cell centre lying on the edge of the area drops out
+    f_lat_min, f_lat_max, f_lon_min, f_lon_max = np.array([lat_min, lat_max, lon_min, lon_max], dtype=np.float32)
 
-    data = np.sort(sat_filt, order=['Lat', 'Lon'])['RainRate'].reshape(len(lats), len(lons))
-    clevs = np.concatenate(([-1, 0], np.array([pow(2, i) for i in range(0, 9)])))
-    create_contour_plot(data, out_file_path + '.png', lat_min, lon_min, lat_max, lon_max, out_file_path, clevs=clevs,
-                        cmap=cm.s3pcpn_l)
+    data = np.full((nrows, ncols), no_data_val, dtype=np.float32)
+    if _HAS_NUMBA:
+        _scatter(sat_lat, sat_lon, sat_rf, f_lat_min, f_lat_max, f_lon_min, f_lon_max, lat0, lon0, cell_size, data)
+    else:
+        mask = (sat_lat >= f_lat_min) & (sat_lat <= f_lat_max) & (sat_lon >= f_lon_min) & (sat_lon <= f_lon_max)
+        i = np.rint((sat_lat[mask] - lat0) / cell_size).astype(np.int32)
+        j = np.rint((sat_lon[mask] - lon0) / cell_size).astype(np.int32)
+        # same guard as _scatter, so that an index off the grid is dropped rather than wrapped around
+        inside = (i >= 0) & (i < nrows) & (j >= 0) & (j < ncols)
+        data[i[inside], j[inside]] = sat_rf[mask][inside]
+
+    # format the whole grid in memory and hand it to the disk in a single write
+    asc_buf = io.BytesIO()
+    asc_buf.write('NCOLS %d\n' % ncols)
+    asc_buf.write('NROWS %d\n' % nrows)
+    asc_buf.write('XLLCORNER %f\n' % lon0)
+    asc_buf.write('YLLCORNER %f\n' % lat0)
+    asc_buf.write('CELLSIZE %f\n' % cell_size)
+    asc_buf.write('NODATA_VALUE %d\n' % no_data_val)
+    np.savetxt(asc_buf, np.flip(data, 0), fmt='%g', delimiter=' ')
+
+    with open(out_file_path, 'wb') as out_file:
+        out_file.write(asc_buf.getvalue())
+
+    create_contour_plot(data, out_file_path + '.png', lat_min, lon_min, lat_max, lon_max, out_file_path,
+                        clevs=_CLEVS_HOURLY, cmap=_CMAP_HOURLY)
+
+
+_plot_cache = threading.local()
+
+
+def _get_plot_canvas(lat_min, lon_min, lat_max, lon_max, basemap=None):
+    """
+    returns a (figure, map axes, colorbar axes, basemap) tuple with the coastlines, parallels and meridians already
+    drawn. These are the expensive parts of a plot, hence they are built once per thread and area and then reused
+    :param lat_min:
+    :param lon_min:
+    :param lat_max:
+    :param lon_max:
+    :param basemap: basemap to draw on when the area is first drawn in this thread. If None, a mercator basemap of the
+    area is created. Ignored once the area is cached
+    :return:
+    """
+    canvases = getattr(_plot_cache, 'canvases', None)
+    if canvases is None:
+        canvases = _plot_cache.canvases = {}
+
+    # keyed on the area only, so that passing a new basemap per call does not pile up figures
+    key = (lat_min, lon_min, lat_max, lon_max)
+    if key not in canvases:
+        # a standalone figure keeps off the pyplot global state, so that this can run in worker threads
+        fig = Figure(figsize=(8.27, 11.69))
+        FigureCanvasAgg(fig)
+        ax = fig.add_axes([0.1, 0.1, 0.8, 0.8])
+        if basemap is None:
+            basemap = Basemap(projection='merc', llcrnrlon=lon_min, llcrnrlat=lat_min, urcrnrlon=lon_max,
+                              urcrnrlat=lat_max, resolution='h')
+        basemap.drawcoastlines(ax=ax)
+        parallels = np.arange(math.floor(lat_min) - 1, math.ceil(lat_max) + 1, 1)
+        basemap.drawparallels(parallels, labels=[1, 0, 0, 0], fontsize=10, ax=ax)
+        meridians = np.arange(math.floor(lon_min) - 1, math.ceil(lon_max) + 1, 1)
+        basemap.drawmeridians(meridians, labels=[0, 0, 0, 1], fontsize=10, ax=ax)
+        cax = make_axes_locatable(ax).append_axes('bottom', size='5%', pad='5%')
+        canvases[key] = (fig, ax, cax, basemap)
+
+    return canvases[key]
+
+
+_render_lock = threading.Lock()
+
+
+def _save_png(fig, out_file_path):
+    """
+    save the figure as a png with zlib level 1. The plots are only previews, hence the faster encoding is worth the
+    slightly bigger files. Falls back to savefig if PIL is not available
+    :param fig: figure with an agg canvas
+    :param out_file_path:
+    :return:
+    """
+    # fewer, longer vertex runs when agg renders the contour polygons. rc_context swaps the global rcParams, hence
+    # the lock keeps concurrent threads from restoring each other's values
+    with _render_lock, matplotlib.rc_context({'agg.path.chunksize': 10000}):
+        if Image is None:
+            fig.savefig(out_file_path)
+            return
+        fig.canvas.draw()
+
+    width, height = fig.canvas.get_width_height()
+    img = Image.frombuffer('RGBA', (width, height), fig.canvas.buffer_rgba(), 'raw', 'RGBA', 0, 1)
+    img.save(out_file_path, compress_level=1, optimize=False)
 
 
 def create_contour_plot(data, out_file_path, lat_min, lon_min, lat_max, lon_max, plot_title, basemap=None, clevs=None,
@@ -530,7 +730,8 @@ def create_contour_plot(data, out_file_path, lat_min, lon_min, lat_max, lon_max,
     create a contour plot using basemap
     :param cmap: color map
     :param clevs: color levels
-    :param basemap: creating basemap takes time, hence you can create it outside and pass it over
+    :param basemap: creating basemap takes time, hence you can create it outside and pass it over. The map of an area
+    is cached per thread, hence this is only used for the first plot of the area
     :param plot_title:
     :param data: 2D grid data
     :param out_file_path:
@@ -540,34 +741,32 @@ def create_contour_plot(data, out_file_path, lat_min, lon_min, lat_max, lon_max,
     :param lon_max:
     :return:
     """
-    fig = plt.figure(figsize=(8.27, 11.69))
-    ax = fig.add_axes([0.1, 0.1, 0.8, 0.8])
-    if basemap is None:
-        basemap = Basemap(projection='merc', llcrnrlon=lon_min, llcrnrlat=lat_min, urcrnrlon=lon_max, urcrnrlat=lat_max,
-                          resolution='h')
-    basemap.drawcoastlines()
-    parallels = np.arange(math.floor(lat_min) - 1, math.ceil(lat_max) + 1, 1)
-    basemap.drawparallels(parallels, labels=[1, 0, 0, 0], fontsize=10)
-    meridians = np.arange(math.floor(lon_min) - 1, math.ceil(lon_max) + 1, 1)
-    basemap.drawmeridians(meridians, labels=[0, 0, 0, 1], fontsize=10)
+    fig, ax, cax, basemap = _get_plot_canvas(lat_min, lon_min, lat_max, lon_max, basemap)
 
     ny = data.shape[0]
     nx = data.shape[1]
-    lons, lats = basemap.makegrid(nx, ny)
+    _, _, x, y = basemap.makegrid(nx, ny, returnxy=True)
 
     if clevs is None:
         clevs = np.arange(-1, np.max(data) + 1, 1)
 
     # cs = basemap.contourf(lons, lats, data, clevs, cmap=cm.s3pcpn_l, latlon=True)
-    cs = basemap.contourf(lons, lats, data, clevs, cmap=cmap, latlon=True)
+    # contour on the projected grid directly, basemap.contourf resets the current image through pyplot
+    cs = ax.contourf(x, y, data, clevs, cmap=cmap)
 
-    cbar = basemap.colorbar(cs, location='bottom', pad="5%")
-    cbar.set_label('mm')
+    try:
+        cax.cla()
+        cbar = fig.colorbar(cs, cax=cax, orientation='horizontal')
+        cbar.set_label('mm')
 
-    plt.title(plot_title)
-    plt.draw()
-    fig.savefig(out_file_path)
-    plt.close()
+        ax.set_title(plot_title)
+        _save_png(fig, out_file_path)
+    finally:
+        # only the contours change between plots, the map underneath is kept for the next call. Remove them even if
+        # saving failed, so that they do not leak into later plots of this area
+        for c in cs.collections:
+            c.remove()
+        cax.cla()
 
 
 def extract_all(wrf_home, start_date, end_date):
@@ -626,6 +825,99 @@ def extract_all(wrf_home, start_date, end_date):
 
 
 class TestExtractorMethods(unittest.TestCase):
+    lat_min = 5.722969
+    lon_min = 79.52146
+    lat_max = 10.06425
+    lon_max = 82.18992
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def _make_jaxa_zip(self, skip=None, far_sample=False):
+        # AsiaSS layout: 0.1 deg cell centres, rows from north to south, west to east within a row
+        rng = np.random.RandomState(0)
+        lines = ['Lat,Lon,RainRate']
+        if far_sample:
+            # first point of a real AsiaSS csv, far from the area, so its float32 error spans many cells
+            lines.append('59.95,60.05,0.00')
+        for lat in np.arange(12.95, 2.9, -0.1):
+            for lon in np.arange(77.05, 85.0, 0.1):
+                rf = rng.gamma(1.0, 5.0) if rng.rand() < 0.4 else 0.0
+                if skip != ('%.2f' % lat, '%.2f' % lon):
+                    lines.append('%.2f,%.2f,%.2f' % (lat, lon, rf))
+
+        csv_name = 'gsmap_nrt.20170526.0600.05_AsiaSS.csv'
+        zip_buf = io.BytesIO()
+        sat_zip = zipfile.ZipFile(zip_buf, 'w', zipfile.ZIP_DEFLATED)
+        sat_zip.writestr(csv_name, '\n'.join(lines) + '\n')
+        sat_zip.close()
+
+        zip_file_path = os.path.join(self.tmp_dir, csv_name + '.zip')
+        with open(zip_file_path, 'wb') as zip_file:
+            zip_file.write(zip_buf.getvalue())
+        return zip_file_path, '\n'.join(lines)
+
+    def _expected_asc(self, csv_text, lat_min, lon_min, lat_max, lon_max):
+        # grid as built by the former sort/unique/reshape implementation
+        sat = np.genfromtxt(io.BytesIO(csv_text), delimiter=',', names=True)
+        sat_filt = sat[(sat['Lat'] <= lat_max) & (sat['Lat'] >= lat_min) & (sat['Lon'] <= lon_max) & (
+            sat['Lon'] >= lon_min)]
+        lats = np.sort(np.unique(sat_filt['Lat']))
+        lons = np.sort(np.unique(sat_filt['Lon']))
+        header = ['NCOLS %d' % len(lons), 'NROWS %d' % len(lats), 'XLLCORNER %f' % lons[0],
+                  'YLLCORNER %f' % lats[0], 'CELLSIZE %f' % 0.1, 'NODATA_VALUE %d' % -99]
+        data = np.sort(sat_filt, order=['Lat', 'Lon'])['RainRate'].reshape(len(lats), len(lons))
+        return header, np.flip(data, 0)
+
+    def _check_process_zip_file(self, bbox=None, far_sample=False):
+        lat_min, lon_min, lat_max, lon_max = bbox or (self.lat_min, self.lon_min, self.lat_max, self.lon_max)
+        zip_file_path, csv_text = self._make_jaxa_zip(far_sample=far_sample)
+        out_file_path = os.path.join(self.tmp_dir, 'jaxa_sat_rf_2017-05-26_06:00.asc')
+        process_zip_file(zip_file_path, out_file_path, lat_min, lon_min, lat_max, lon_max)
+
+        header, data = self._expected_asc(csv_text, lat_min, lon_min, lat_max, lon_max)
+        with open(out_file_path) as out_file:
+            lines = out_file.read().splitlines()
+        self.assertEqual(header, lines[:6])
+        np.testing.assert_allclose(np.loadtxt(lines[6:]), data, atol=1e-4)
+        self.assertTrue(os.path.exists(out_file_path + '.png'))
+
+        # a missing point is written as no data, the rest of the grid is unchanged
+        zip_file_path, _ = self._make_jaxa_zip(skip=('10.05', '79.55'), far_sample=far_sample)
+        process_zip_file(zip_file_path, out_file_path, lat_min, lon_min, lat_max, lon_max)
+        with open(out_file_path) as out_file:
+            grid = np.loadtxt(out_file.read().splitlines()[6:])
+        self.assertEqual(-99, grid[0, 0])
+        np.testing.assert_allclose(grid.flat[1:], data.flat[1:], atol=1e-4)
+
+    def test_process_zip_file(self):
+        self._check_process_zip_file()
+
+    def test_process_zip_file_without_numba(self):
+        global _HAS_NUMBA
+        has_numba = _HAS_NUMBA
+        _HAS_NUMBA = False
+        try:
+            self._check_process_zip_file()
+        finally:
+            _HAS_NUMBA = has_numba
+
+    def test_process_zip_file_cell_centre_bbox(self):
+        # bbox edges exactly on cell centres, with the grid sampled far away from the area
+        bbox = (5.75, 79.55, 10.05, 82.15)
+        self._check_process_zip_file(bbox=bbox, far_sample=True)
+
+        global _HAS_NUMBA
+        has_numba = _HAS_NUMBA
+        _HAS_NUMBA = False
+        try:
+            self._check_process_zip_file(bbox=bbox, far_sample=True)
+        finally:
+            _HAS_NUMBA = has_numba
+
     def test_extract_jaxa_satellite_data(self):
         extract_jaxa_satellite_data(utils.datetime_lk_to_utc(dt.datetime(2017, 5, 25)),
                                     utils.datetime_lk_to_utc(dt.datetime(2017, 5, 28)), '/tmp/rf')
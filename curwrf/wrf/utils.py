@@ -14,7 +14,6 @@ import time
 import math
 from urllib2 import urlopen, HTTPError, URLError
 
-import multiprocessing
 import pkg_resources
 import yaml
 import errno
@@ -300,8 +299,9 @@ def download_file(url, dest):
         raise e
 
 
-def download_parallel(url_dest_list, procs=multiprocessing.cpu_count()):
-    Parallel(n_jobs=procs)(delayed(download_file)(i[0], i[1]) for i in url_dest_list)
+def download_parallel(url_dest_list, procs=constants.DEFAULT_THREAD_COUNT):
+    # downloads are I/O bound, hence threads are enough and avoid forking a process per worker
+    Parallel(n_jobs=procs, backend='threading')(delayed(download_file)(i[0], i[1]) for i in url_dest_list)
 
 
 # def namedtuple_with_defaults(typename, field_names, default_values=()):